@@ -1,4 +1,5 @@
 #!/usr/bin/env python
+import numpy as np
 import pygmo as pg
 
 class MinimizationProblem:
@@ -34,9 +35,25 @@ class MinimizationProblem:
         Arguments:
         - X: vector solution (flatten vector of x1,x2,x3.. within lower & upper bounds)
         """
-        fitness = sum(X)
+        fitness = np.sum(X)
         return [fitness]  # or use [-fitness] to transform into a maximization problem
 
+    def batch_fitness(self, dvs):
+        """
+        Evaluates fitness of several solutions at once (used by the optimizers to evaluate
+        the whole population in a single call).
+
+        Arguments:
+        - dvs: flatten vector of solutions (solutions are concatenated one after the other)
+        """
+        fitness = dvs.reshape(-1, self.dim).sum(axis=1)
+        return fitness  # or use -fitness to transform into a maximization problem
+
+    def has_batch_fitness(self):
+        """
+        Tell pygmo that batch_fitness() is implemented
+        """
+        return True
 
     def get_bounds(self):
         """
@@ -30,18 +30,21 @@ class Optimizer:
         self.interations = iterations
         self.early_stopping_counter = early_stopping_counter
 
-        # create the population
-        self.population = pg.population(problem, pop_size, seed=seed)
+        # create the population (initial solutions are evaluated at once if the problem has a batch fitness)
+        if not isinstance(problem, pg.problem):
+            problem = pg.problem(problem)
+        bfe = pg.bfe(pg.member_bfe()) if problem.has_batch_fitness() else None
+        self.population = pg.population(problem, pop_size, b=bfe, seed=seed)
         
         # create the solver
         if method.lower() in ['boa', 'mboa', 'aboa']:
-            self.solver = self.boa_solver(max_gen=iterations, variant=method, **kwargs)
+            self.solver = self.boa_solver(max_gen=iterations, variant=method, seed=seed, **kwargs)
             self.custom_algorithm = True
         elif method.lower() == 'saboa':
-            self.solver = self.saboa_solver(max_gen=iterations, **kwargs)
+            self.solver = self.saboa_solver(max_gen=iterations, seed=seed, **kwargs)
             self.custom_algorithm = True
         elif method.lower() in ['xboa', 'xaboa']:
-            self.solver = self.xboa_solver(max_gen=iterations, variant=method, **kwargs)
+            self.solver = self.xboa_solver(max_gen=iterations, variant=method, seed=seed, **kwargs)
             self.custom_algorithm = True
         else:
             self.solver = 'random'
@@ -66,13 +69,13 @@ class Optimizer:
         else:
             early_stopping_counter = self.early_stopping_counter
             old_best_fitness = self.population.champion_f[0]
+            alg = self.solver.extract(object)
             if self.verbosity_level > 0:
                 print("{:^7}{:^10}{:>10}{:>10}{:>10}".format(
                     "Gen", "Fevals", "Fbest", "Improv", "Duration"))
             for i in range(1, self.interations+1):
                 # evolve the population for 1 iteration at a time
                 time_start = time.time()
-                alg = self.solver.extract(object)
                 if self.custom_algorithm:
                     alg.set_iter(i)
                 self.population = self.solver.evolve(self.population)
@@ -86,9 +89,16 @@ class Optimizer:
                 improvemnt = best_fitness - old_best_fitness
                 if improvemnt == 0:
                     early_stopping_counter -= 1
+                    # no butterfly has improved: the swarm has converged, so stop twice as fast
+                    if self.custom_algorithm and alg.get_improvements() == 0:
+                        early_stopping_counter -= 1
                 else:
                     early_stopping_counter = self.early_stopping_counter
                 old_best_fitness = best_fitness
+
+                # stop if the algorithm asks for it (e.g. xBOA only revisits solutions that are in its fitness cache)
+                if self.custom_algorithm and alg.should_stop():
+                    early_stopping_counter = 0
                 
                 # log statistics on screen
                 if self.verbosity_level > 0 and i % self.verbosity_level == 0:
@@ -109,7 +119,8 @@ class Optimizer:
         return best_solution
 
     def boa_solver(self, sensory_modality=0.01, power_exponent=0.1, 
-        switch_probability=0.8, mu=2, variant="BOA", max_gen=1, **unused_args):
+        switch_probability=0.8, mu=2, variant="BOA", max_gen=1, seed=None, n_workers=1,
+        bfe=None, **unused_args):
         """ 
         Solve the problem using Burtterfly Optimization Algorithm.
 
@@ -123,13 +134,18 @@ class Optimizer:
           2. "mBOA": BOA with intensive search from [Arora et al. 2018]
           3. "ABOA": BOA with a non-linear update rule for the sensory modality from [Zhang et al. 2020]
         - max_gen: max number of generations (used for updating the sensory modality)
+        - seed: seed of the solver's random number generator
+        - n_workers: number of threads used to evaluate the population (if the problem has no batch_fitness)
+        - bfe: pygmo batch fitness evaluator used to evaluate the population (default: None)
         - **unused_args: capture additional args that may have been added in Optimizer config
         """
         solver = pg.algorithm(BOA(gen=1, c=sensory_modality, a=power_exponent,
-            p=switch_probability, mu=mu, variant=variant, max_gen=max_gen))
+            p=switch_probability, mu=mu, variant=variant, max_gen=max_gen, seed=seed,
+            n_workers=n_workers, bfe=bfe))
         return solver
 
-    def saboa_solver(self, switch_probability=0.8, max_gen=1, **unused_args):
+    def saboa_solver(self, switch_probability=0.8, max_gen=1, seed=None, n_workers=1,
+        bfe=None, **unused_args):
         """ 
         Solve the problem using Self-Adaptative Burtterfly Optimization Algorithm.
         [Fan et al. 2020]
@@ -137,13 +153,18 @@ class Optimizer:
         Arguments:
         - switch_probability: used to switch between global search and local search
         - max_gen: max number of generations (used for updating the sensory modality)
+        - seed: seed of the solver's random number generator
+        - n_workers: number of threads used to evaluate the population (if the problem has no batch_fitness)
+        - bfe: pygmo batch fitness evaluator used to evaluate the population (default: None)
         - **unused_args: capture additional args that may have been added in Optimizer config
         """
-        solver = pg.algorithm(SABOA(gen=1, p=switch_probability, max_gen=max_gen))
+        solver = pg.algorithm(SABOA(gen=1, p=switch_probability, max_gen=max_gen, seed=seed,
+            n_workers=n_workers, bfe=bfe))
         return solver
 
     def xboa_solver(self, sensory_modality=0.01, power_exponent=0.1,
-        switch_probability=0.8, mu=2, variant="xBOA", max_gen=1, **unused_args):
+        switch_probability=0.8, mu=2, variant="xBOA", max_gen=1, cache_size=0, seed=None,
+        n_workers=1, bfe=None, **unused_args):
         """ 
         Solve the problem using Crossover Burtterfly Optimization Algorithm.
 
@@ -156,8 +177,13 @@ class Optimizer:
           1. "xBOA": The xBOA algorithm from [Bendahmane et al. 2021]
           2. "xABOA": xBOA + the non-linear update rule for the sensory modality from [Zhang et al. 2020]
         - max_gen: max number of generations (used for updating the sensory modality)
+        - cache_size: number of evaluated solutions kept in memory to avoid re-evaluating them (0 disables the cache)
+        - seed: seed of the solver's random number generator
+        - n_workers: number of threads used to evaluate the population (if the problem has no batch_fitness)
+        - bfe: pygmo batch fitness evaluator used to evaluate the population (default: None)
         - **unused_args: capture additional args that may have been added in Optimizer config
         """
         solver = pg.algorithm(XBOA(gen=1, c=sensory_modality, a=power_exponent, 
-            p=switch_probability, mu=mu, variant=variant, max_gen=max_gen))
+            p=switch_probability, mu=mu, variant=variant, max_gen=max_gen, cache_size=cache_size,
+            seed=seed, n_workers=n_workers, bfe=bfe))
         return solver
@@ -1,6 +1,8 @@
 #!/usr/bin/env python
-import random
+import sys
 import math
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 class BOA:
     """
@@ -8,7 +10,8 @@ class BOA:
 
     Implements the BOA algorithm as a Pygmo UDA
     """
-    def __init__(self, gen=1, c=0.01, a=0.1, p=0.8, mu=2, max_gen=1, variant="BOA"):
+    def __init__(self, gen=1, c=0.01, a=0.1, p=0.8, mu=2, max_gen=1, variant="BOA", seed=None,
+        n_workers=1, bfe=None):
         """
         Creates a Pygmo UDA implementing Butterfly Optimization Algorithm
 
@@ -23,6 +26,11 @@ class BOA:
           1. "BOA": The standard BOA algorithm from [Arora et al. 2019] & [Arora et al. 2016]
           2. "mBOA": BOA with intensive search from [Arora et al. 2018]
           3. "ABOA": BOA with a non-linear update rule for the sensory modality from [Zhang et al. 2020]
+        - seed: Seed of the random number generator (if None, a random seed is used)
+        - n_workers: Number of threads used to evaluate the population when the problem does not
+          implement batch_fitness (useful for expensive fitness functions)
+        - bfe: Pygmo batch fitness evaluator used to evaluate the population (e.g. pygmo.bfe(pygmo.mp_bfe())
+          for parallel evaluation). If None, batch_fitness or the thread pool is used
         
         Implementation notes:
         1. Updating c-parameter:
@@ -36,7 +44,8 @@ class BOA:
             In the paper, the switch condition is supposed to execute when a random number r < p,
             but in authors code they use r > p.
         In our code, we use the same rules as in the authors code, assuming that the pseudo-code
-        in the papers might be outdated.
+        in the papers might be outdated. However, all butterflies are moved at once (using the best
+        solution of the previous generation) so the population can be updated with numpy arrays.
         
         References:
         - [Arora et al. 2016] "An Improved Butterfly Optimization Algorithm for Global Optimization"
@@ -55,69 +64,72 @@ class BOA:
         self.max_iterations = max_gen
         self.verbosity_level = 0
         self.log = []
+        self.pending_log = []
         self.current_iteration = 1
+        self.improvements = 0
+        self.lb = None
+        self.ub = None
+        self.rng = np.random.default_rng(seed)
+        self.n_workers = n_workers
+        self.bfe = bfe
 
     def evolve(self, population):
         """
         Evolve the population for a certain number of iterations (specified 
         during initiatlization)
         """
+        # extract problem bounds (only once, they don't change between generations)
+        if self.lb is None:
+            bounds = population.problem.get_bounds()
+            self.lb = np.asarray(bounds[0])
+            self.ub = np.asarray(bounds[1])
+        lb = self.lb
+        ub = self.ub
+
         # extract population individuals
-        bounds = population.problem.get_bounds()
-        solutions_x = population.get_x()
-        solutions_fitness = population.get_f()
-        solutions_IDs = population.get_ID()
-        best_id = solutions_IDs[population.best_idx()]
-        pop = dict()
-        for id, fit, x in zip(solutions_IDs, solutions_fitness, solutions_x):
-            pop[id] = {'fit':fit, 'x':x}
+        X = population.get_x()
+        F = population.get_f()[:, 0]
+        N = len(X)
+        changed = np.zeros(N, dtype=bool)
+        best_idx = population.best_idx()
 
         for i in range(self.iterations):
-            old_best_fit = pop[best_id]['fit']
-            for id in solutions_IDs:
-                x = pop[id]['x']
-                
-                # compute frangrace
-                fitness = pop[id]['fit'][0]
-                if fitness > 0:
-                    f = self.c * (fitness ** self.a)
-                else:
-                    # multiply by -1 to avoid getting a complex result when calculating exponent
-                    f = self.c * ((-fitness) ** self.a)
-
-                # move butterflies
-                r1 = random.random()
-                r2 = random.random()
-                if random.random() > self.p:
-                    # move toward best butterfly
-                    x += f * (r1 * r2 * pop[best_id]['x'] - x)
-                else:
-                    # find random butterfly in the neighbourhood
-                    j = random.choice(list(pop))
-                    k = random.choice(list(pop))
-                    x += f * (r1 * r2 * pop[j]['x'] - pop[k]['x'])
-
-                # force solution bounds and evaluate the fitness
-                x = self.force_bounds(x, bounds)
-                new_fitness = population.problem.fitness(x)
-
-                # intensive exploitation search [Arora et al. 2018]
-                if self.variant == "mboa":
-                    if random.random() < self.p:
-                        r1 = random.random()
-                        r2 = random.random()
-                        x2 = pop[best_id]['x'] + (r1-r2)* pop[best_id]['x']
-                        x2 = self.force_bounds(x2, bounds)
-                        new_fitness_x2 = population.problem.fitness(x2)
-                        if new_fitness_x2 < new_fitness:
-                            x = x2
-                            new_fitness = new_fitness_x2
-
-                # evaluate new butterfly and update the population if needed
-                if new_fitness < fitness:
-                    pop[id] = {'fit':new_fitness, 'x':x} 
-                if new_fitness < pop[best_id]['fit']:
-                    best_id = id
+            old_best_fit = F[best_idx]
+
+            # compute frangrace (use absolute value to avoid getting a complex result when calculating exponent)
+            f = self.c * np.abs(F) ** self.a
+
+            # move butterflies
+            r1, r2, r3 = self.rng.random((3, N))
+            r = (r1 * r2)[:, None]
+            j, k = self.rng.integers(0, N, (2, N))
+            # move toward best butterfly
+            global_move = f[:, None] * (r * X[best_idx] - X)
+            # find random butterfly in the neighbourhood
+            local_move = f[:, None] * (r * X[j] - X[k])
+            X_new = X + np.where((r3 > self.p)[:, None], global_move, local_move)
+
+            # force solution bounds and evaluate the fitness
+            X_new = self.force_bounds(X_new, lb, ub)
+            F_new = self.batch_fitness(population.problem, X_new)
+
+            # intensive exploitation search [Arora et al. 2018]
+            if self.variant == "mboa":
+                search_idx = np.flatnonzero(self.rng.random(N) < self.p)
+                r1, r2 = self.rng.random((2, len(search_idx)))
+                X2 = X[best_idx] + (r1-r2)[:, None] * X[best_idx]
+                X2 = self.force_bounds(X2, lb, ub)
+                F2 = self.batch_fitness(population.problem, X2)
+                better = F2 < F_new[search_idx]
+                X_new[search_idx[better]] = X2[better]
+                F_new[search_idx[better]] = F2[better]
+
+            # evaluate new butterflies and update the population if needed
+            improved = F_new < F
+            X = np.where(improved[:, None], X_new, X)
+            F = np.where(improved, F_new, F)
+            changed |= improved
+            best_idx = np.argmin(F)
 
             # update sensory modality: 
             if self.variant == "aboa":
@@ -130,16 +142,30 @@ class BOA:
                 self.c += 0.025 / (self.c * self.max_iterations)
             
             # calculate fitness improvemnt and save log
-            improvemnt =  pop[best_id]['fit'][0] - old_best_fit[0]
+            improvemnt =  F[best_idx] - old_best_fit
             self.save_log(i+1, population.problem.get_fevals(), 
-                pop[best_id]['fit'][0], improvemnt)
+                F[best_idx], improvemnt)
 
-        # update the population
-        for i in range(len(solutions_IDs)):
-            id = solutions_IDs[i]
-            population.set_xf(i, pop[id]['x'], pop[id]['fit'])
+        # update the population (only the butterflies that have improved)
+        self.improvements = np.count_nonzero(changed)
+        for i in np.flatnonzero(changed):
+            population.set_xf(i, X[i], F[i:i+1])
 
+        self.flush_log()
         return population
+
+    def batch_fitness(self, problem, X):
+        """
+        Evaluate the fitness of all the solutions (rows) of X at once
+        """
+        if self.bfe is not None:
+            return self.bfe(problem, X.ravel())
+        if problem.has_batch_fitness():
+            return problem.batch_fitness(X.ravel())
+        if self.n_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.n_workers) as pool:
+                return np.array([fit[0] for fit in pool.map(problem.fitness, X)])
+        return np.array([problem.fitness(x)[0] for x in X])
     
     def set_verbosity(self, l):
         """
@@ -169,24 +195,41 @@ class BOA:
         """
         return self.log
 
+    def get_improvements(self):
+        """
+        Return the number of butterflies that have improved during the last call to evolve
+        """
+        return self.improvements
+
+    def should_stop(self):
+        """
+        Return True if the optimization should be stopped (never the case for this algorithm)
+        """
+        return False
+
     def save_log(self, iteration, fevals, fbest, improvemnt):
         """
-        Archive and print logs
+        Archive logs (they are printed by flush_log)
         """
         if self.verbosity_level > 0 and iteration % self.verbosity_level == 0:
             self.log.append([iteration, fevals, fbest, improvemnt])
-            print("{:^7}{:^7}{:>15}{:>15}".format(iteration, 
+            self.pending_log.append("{:^7}{:^7}{:>15}{:>15}\n".format(iteration, 
                 fevals, round(fbest, 7), round(improvemnt, 7)))
 
-    def force_bounds(self, x, bounds):
+    def flush_log(self):
+        """
+        Print the logs archived since the last flush (called once at the end of evolve)
+        """
+        if self.pending_log:
+            sys.stdout.write("".join(self.pending_log))
+            sys.stdout.flush()
+            self.pending_log.clear()
+
+    def force_bounds(self, x, lb, ub):
         """  
-        Force solution genes to be within lower & upper bounds
+        Force solution genes to be within lower & upper bounds (x is modified in place)
         """
-        for k in range(len(x)):
-            if x[k] < bounds[0][k]:
-                x[k] = bounds[0][k]
-            elif x[k] > bounds[1][k]:
-                x[k] = bounds[1][k]
+        np.clip(x, lb, ub, out=x)
         return x
 
     def set_iter(self, i):
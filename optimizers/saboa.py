@@ -1,5 +1,7 @@
 #!/usr/bin/env python
-import random
+import sys
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 class SABOA:
     """
@@ -7,7 +9,7 @@ class SABOA:
 
     Implements the SABOA algorithm as a Pygmo UDA
     """
-    def __init__(self, gen=1, p=0.8, max_gen=1):
+    def __init__(self, gen=1, p=0.8, max_gen=1, seed=None, n_workers=1, bfe=None):
         """
         Creates a Pygmo UDA implementing Self-Adaptative Butterfly Optimization Algorithm
 
@@ -19,70 +21,98 @@ class SABOA:
         - gen: number of generations (iterations) to evolve the population
         - p: Switch probability
         - max_gen: max number of generations (used for updating the sensory modality)
+        - seed: seed of the random number generator (if None, a random seed is used)
+        - n_workers: number of threads used to evaluate the population when the problem does not
+          implement batch_fitness (useful for expensive fitness functions)
+        - bfe: pygmo batch fitness evaluator used to evaluate the population (e.g. pygmo.bfe(pygmo.mp_bfe())
+          for parallel evaluation). If None, batch_fitness or the thread pool is used
         """
         self.iterations = gen if gen > 1 else 1
         self.p = p if p>=0 and p<=1 else 0.8
         self.max_iterations = max_gen
         self.verbosity_level = 0
         self.log = []
+        self.pending_log = []
         self.current_iteration = 1
+        self.improvements = 0
+        self.lb = None
+        self.ub = None
+        self.rng = np.random.default_rng(seed)
+        self.n_workers = n_workers
+        self.bfe = bfe
 
     def evolve(self, population):
         """
         Evolve the population for a certain number of iterations (specified 
         during initiatlization)
         """
+        # extract problem bounds (only once, they don't change between generations)
+        if self.lb is None:
+            bounds = population.problem.get_bounds()
+            self.lb = np.asarray(bounds[0])
+            self.ub = np.asarray(bounds[1])
+        lb = self.lb
+        ub = self.ub
+
         # extract population individuals
-        bounds = population.problem.get_bounds()
-        solutions_x = population.get_x()
-        solutions_fitness = population.get_f()
-        solutions_IDs = population.get_ID()
-        best_id = solutions_IDs[population.best_idx()]
-        worst_id = solutions_IDs[population.worst_idx()]
-        pop = dict()
-        for id, fit, x in zip(solutions_IDs, solutions_fitness, solutions_x):
-            pop[id] = {'fit':fit, 'x':x}
+        X = population.get_x()
+        F = population.get_f()[:, 0]
+        N = len(X)
+        changed = np.zeros(N, dtype=bool)
+        best_idx = population.best_idx()
+        worst_idx = population.worst_idx()
 
         for i in range(self.iterations):
-            old_best_fit = pop[best_id]['fit']
-            for id in solutions_IDs:
-                x = pop[id]['x']
-                
-                # compute frangrace
-                u = random.random()
-                f = u * (1 - self.current_iteration/self.max_iterations)
-
-                # move butterflies
-                if random.random() > self.p:
-                    # move toward best butterfly
-                    x += pop[best_id]['x'] + (x - pop[best_id]['x']) * f
-                else:
-                    # find random butterfly in the neighbourhood
-                    x = 0.5 * (pop[best_id]['x'] + pop[worst_id]['x']) * f
-
-                # force solution bounds and evaluate the fitness
-                x = self.force_bounds(x, bounds)
-                new_fitness = population.problem.fitness(x)
-
-                # evaluate new butterfly and update the population if needed
-                if new_fitness < pop[id]['fit'][0]:
-                    pop[id] = {'fit':new_fitness, 'x':x} 
-                if new_fitness < pop[best_id]['fit']:
-                    best_id = id
-                if new_fitness > pop[worst_id]['fit']:
-                    worst_id = id
+            old_best_fit = F[best_idx]
+
+            # compute frangrace
+            u, r = self.rng.random((2, N))
+            f = (u * (1 - self.current_iteration/self.max_iterations))[:, None]
+
+            # move butterflies
+            # move toward best butterfly
+            global_move = X + X[best_idx] + (X - X[best_idx]) * f
+            # find random butterfly in the neighbourhood
+            local_move = 0.5 * (X[best_idx] + X[worst_idx]) * f
+            X_new = np.where((r > self.p)[:, None], global_move, local_move)
+
+            # force solution bounds and evaluate the fitness of all new butterflies at once
+            X_new = self.force_bounds(X_new, lb, ub)
+            F_new = self.batch_fitness(population.problem, X_new)
+
+            # evaluate new butterflies and update the population if needed
+            improved = F_new < F
+            X = np.where(improved[:, None], X_new, X)
+            F = np.where(improved, F_new, F)
+            changed |= improved
+            best_idx = np.argmin(F)
+            worst_idx = np.argmax(F)
             
             # calculate fitness improvemnt and save log
-            improvemnt =  pop[best_id]['fit'][0] - old_best_fit[0]
+            improvemnt =  F[best_idx] - old_best_fit
             self.save_log(i+1, population.problem.get_fevals(), 
-                pop[best_id]['fit'][0], improvemnt)
+                F[best_idx], improvemnt)
 
-        # update the population
-        for i in range(len(solutions_IDs)):
-            id = solutions_IDs[i]
-            population.set_xf(i, pop[id]['x'], pop[id]['fit'])
+        # update the population (only the butterflies that have improved)
+        self.improvements = np.count_nonzero(changed)
+        for i in np.flatnonzero(changed):
+            population.set_xf(i, X[i], F[i:i+1])
 
+        self.flush_log()
         return population
+
+    def batch_fitness(self, problem, X):
+        """
+        Evaluate the fitness of all the solutions (rows) of X at once
+        """
+        if self.bfe is not None:
+            return self.bfe(problem, X.ravel())
+        if problem.has_batch_fitness():
+            return problem.batch_fitness(X.ravel())
+        if self.n_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.n_workers) as pool:
+                return np.array([fit[0] for fit in pool.map(problem.fitness, X)])
+        return np.array([problem.fitness(x)[0] for x in X])
     
     def set_verbosity(self, l):
         """
@@ -106,24 +136,41 @@ class SABOA:
         """
         return self.log
 
+    def get_improvements(self):
+        """
+        Return the number of butterflies that have improved during the last call to evolve
+        """
+        return self.improvements
+
+    def should_stop(self):
+        """
+        Return True if the optimization should be stopped (never the case for this algorithm)
+        """
+        return False
+
     def save_log(self, iteration, fevals, fbest, improvemnt):
         """
-        Archive and print logs
+        Archive logs (they are printed by flush_log)
         """
         if self.verbosity_level > 0 and iteration % self.verbosity_level == 0:
             self.log.append([iteration, fevals, fbest, improvemnt])
-            print("{:^7}{:^7}{:>15}{:>15}".format(iteration, 
+            self.pending_log.append("{:^7}{:^7}{:>15}{:>15}\n".format(iteration, 
                 fevals, round(fbest, 7), round(improvemnt, 7)))
 
-    def force_bounds(self, x, bounds):
+    def flush_log(self):
+        """
+        Print the logs archived since the last flush (called once at the end of evolve)
+        """
+        if self.pending_log:
+            sys.stdout.write("".join(self.pending_log))
+            sys.stdout.flush()
+            self.pending_log.clear()
+
+    def force_bounds(self, x, lb, ub):
         """  
-        Force solution genes to be within lower & upper bounds
+        Force solution genes to be within lower & upper bounds (x is modified in place)
         """
-        for k in range(len(x)):
-            if x[k] < bounds[0][k]:
-                x[k] = bounds[0][k]
-            elif x[k] > bounds[1][k]:
-                x[k] = bounds[1][k]
+        np.clip(x, lb, ub, out=x)
         return x
 
     def set_iter(self, i):
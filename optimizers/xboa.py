@@ -1,7 +1,9 @@
 #!/usr/bin/env python
-import random
+import sys
 import math
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 class XBOA:
     """
@@ -9,7 +11,8 @@ class XBOA:
 
     Implements the XBOA algorithm as a Pygmo UDA
     """
-    def __init__(self, gen=1, c=0.01, a=0.1, p=0.8, mu=2, max_gen=1, variant="xBOA"):
+    def __init__(self, gen=1, c=0.01, a=0.1, p=0.8, mu=2, max_gen=1, variant="xBOA", cache_size=0,
+        seed=None, n_workers=1, bfe=None):
         """
         Creates a Pygmo UDA implementing the Crossover Butterfly Optimization Algorithm
 
@@ -23,6 +26,13 @@ class XBOA:
           1. "xBOA": The xBOA algorithm from [Bendahmane et al. 2021], which is a variant of BOA [Arora et al. 2019] + the crossover operator
           2. "xABOA": xBOA + the non-linear update rule for the sensory modality from [Zhang et al. 2020]
         - max_gen: max number of generations (used for updating the sensory modality)
+        - cache_size: max number of solutions whose fitness is kept in memory to avoid evaluating
+          them again (0 disables the cache, which should be the case if the fitness is not deterministic)
+        - seed: seed of the random number generator (if None, a random seed is used)
+        - n_workers: number of threads used to evaluate the population when the problem does not
+          implement batch_fitness (useful for expensive fitness functions)
+        - bfe: Pygmo batch fitness evaluator used to evaluate the population (e.g. pygmo.bfe(pygmo.mp_bfe())
+          for parallel evaluation). If None, batch_fitness or the thread pool is used
     
         References:
         - [Bendahmane et al. 2021] "Unknown Area Exploration for Robots with Energy Constraints using a Modified Butterfly Optimization Algorithm" 
@@ -40,8 +50,18 @@ class XBOA:
         self.max_iterations = max_gen
         self.verbosity_level = 0
         self.log = []
+        self.pending_log = []
         self.current_iteration = 1
+        self.improvements = 0
         self.mu = mu
+        self.cache_size = cache_size
+        self.fitness_cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.evolved_generations = 0
+        self.rng = np.random.default_rng(seed)
+        self.n_workers = n_workers
+        self.bfe = bfe
 
     def evolve(self, population):
         """
@@ -50,94 +70,181 @@ class XBOA:
         """
         # extract population individuals
         bounds = population.problem.get_bounds()
-        pop_size = len(population.get_ID())
+        lb = np.asarray(bounds[0])
+        ub = np.asarray(bounds[1])
+        pop_size = len(population)
+        dim = len(lb)
+        c, a, p = self.c, self.a, self.p
+        if self.variant == "xaboa":
+            update_c = self.nonlinear_c_update
+        else:
+            update_c = self.linear_c_update
+
+        X = population.get_x()
+        F = population.get_f()[:, 0]
+        changed = np.zeros(pop_size, dtype=bool)
 
         for i in range(self.iterations):
-            old_best_fit = population.champion_f
-
-            # extract population individuals
-            solutions_x = population.get_x()
-            solutions_fitness = population.get_f()
-            solutions_IDs = population.get_ID()
-            pop = dict()
-            for id, fit, x in zip(solutions_IDs, solutions_fitness, solutions_x):
-                pop[id] = {'fit':fit[0], 'x':x}
-
-            # loop through every butterfly
-            for id in solutions_IDs:
-                x = pop[id]['x']
-
-                # compute frangrace
-                fitness = pop[id]['fit']
-                if fitness > 0:
-                    f = self.c * (fitness ** self.a)
-                else:
-                    # multiply by -1 to avoid getting a complex result when calculating exponent
-                    f = self.c * ((-fitness) ** self.a)
-
-                # move butterflies
-                if random.random() > self.p:
-                    # apply crossover operator to create two offsprings
-                    j = id
-                    while j == id and pop_size > 1: 
-                        j = random.choice(list(pop))
-                    mate = pop[j]['x'].copy()
-                    x_ = x.copy()
-                    crossover_point = random.choice(range(len(x)-1))+1
-                    x1 = x_[:crossover_point]
-                    x2 = x_[crossover_point:]
-                    mate1 = mate[:crossover_point]
-                    mate2 = mate[crossover_point:]
-                    offspring1 = np.concatenate([x1, mate2])
-                    offspring2 = np.concatenate([mate1, x2])
-                
-                    # add offsprings to the population and evaluate the fitness
-                    offspring1 = self.force_bounds(offspring1, bounds)
-                    offspring2 = self.force_bounds(offspring2, bounds)
-                    new_fitness1 = population.problem.fitness(offspring1)[0]
-                    new_fitness2 = population.problem.fitness(offspring2)[0]
-                    
-                    # replace parent by best offspring
-                    if new_fitness1 < fitness or new_fitness2 < fitness:
-                        if new_fitness1 < new_fitness2:
-                            pop[id] = {'fit':new_fitness1, 'x':offspring1}
-                        else:
-                            pop[id] = {'fit':new_fitness2, 'x':offspring2} 
-                else:
-                    # find random butterfly in the neighbourhood
-                    r1 = random.random()
-                    r2 = random.random()
-                    j = random.choice(list(pop))
-                    k = random.choice(list(pop))
-                    x += f * (r1 * r2 * pop[j]['x'] - pop[k]['x'])
-
-                    # add new solution to the population if better
-                    x = self.force_bounds(x, bounds)
-                    new_fitness = population.problem.fitness(x)[0]
-                    if new_fitness < fitness:
-                        pop[id] = {'fit':new_fitness, 'x':x} 
+            old_best_fit = F.min()
+            self.cache_hits = 0
+            self.cache_misses = 0
+            X_new = X.copy()
+            F_new = F.copy()
+
+            # compute frangrace (use absolute value to avoid getting a complex result when calculating exponent)
+            f = c * np.abs(F) ** a
+
+            # move butterflies
+            crossover = self.rng.random(pop_size) > p
+            # the crossover needs at least two genes, otherwise all butterflies move in the neighbourhood
+            if dim < 2:
+                crossover[:] = False
+            cross_idx = np.flatnonzero(crossover)
+
+            # draw a mate (different from the butterfly itself when possible) and a crossover point
+            mate_idx = self.rng.integers(0, max(pop_size-1, 1), len(cross_idx))
+            if pop_size > 1:
+                mate_idx[mate_idx >= cross_idx] += 1
+            crossover_points = self.rng.integers(1, dim, len(cross_idx))
+
+            # apply crossover operator to create two offsprings
+            parents = X[cross_idx]
+            mates = X[mate_idx]
+            first_part = np.arange(dim)[None, :] < crossover_points[:, None]
+            offsprings1 = np.where(first_part, parents, mates)
+            offsprings2 = np.where(first_part, mates, parents)
+            offsprings1 = self.force_bounds(offsprings1, lb, ub)
+            offsprings2 = self.force_bounds(offsprings2, lb, ub)
+
+            # find random butterflies in the neighbourhood
+            move_idx = np.flatnonzero(~crossover)
+            r1, r2 = self.rng.random((2, len(move_idx)))
+            j, k = self.rng.integers(0, pop_size, (2, len(move_idx)))
+            X_move = X[move_idx] + f[move_idx, None] * ((r1 * r2)[:, None] * X[j] - X[k])
+            X_move = self.force_bounds(X_move, lb, ub)
+
+            # evaluate the offsprings and the moved butterflies at once
+            F_all = self.batch_fitness(population.problem, np.concatenate([offsprings1, offsprings2, X_move]))
+            F1, F2, F_move = np.split(F_all, [len(cross_idx), 2*len(cross_idx)])
+
+            # replace parents by best offsprings
+            best_offsprings = np.where((F1 < F2)[:, None], offsprings1, offsprings2)
+            F_best = np.minimum(F1, F2)
+            better = F_best < F[cross_idx]
+            X_new[cross_idx[better]] = best_offsprings[better]
+            F_new[cross_idx[better]] = F_best[better]
+            changed[cross_idx[better]] = True
+
+            # add new solutions to the population if better
+            better = F_move < F[move_idx]
+            X_new[move_idx[better]] = X_move[better]
+            F_new[move_idx[better]] = F_move[better]
+            changed[move_idx[better]] = True
+            X = X_new
+            F = F_new
 
             # update sensory modality: 
-            if self.variant == "xaboa":
-                # update sensor modality using a non-linear update rule according to [Zhang et al. 2020]
-                (a0, a1) = (0.1, 0.3)
-                it = (self.current_iteration/self.max_iterations)**2
-                self.c = a0 - (a0-a1)*math.sin(math.pi/self.mu*it)
-            else:
-                # update sensor modality according to the classic linear rule according to [Arora et al. 2016]
-                self.c += 0.025 / (self.c * self.max_iterations)
+            c = update_c(c)
 
             # calculate fitness improvemnt and save log
-            improvemnt =  population.champion_f[0] - old_best_fit[0]
+            improvemnt =  F.min() - old_best_fit
             self.save_log(i+1, population.problem.get_fevals(), 
-                population.champion_f[0], improvemnt)
+                F.min(), improvemnt)
 
-        # update the population
-        for i in range(len(solutions_IDs)):
-            id = solutions_IDs[i]
-            population.set_xf(i, pop[id]['x'], [pop[id]['fit']])
+            # stop if the population only revisits solutions that have already been evaluated
+            self.evolved_generations += 1
+            if self.should_stop():
+                break
 
+        # save the updated sensory modality and update the population (only the butterflies that have improved)
+        self.c = c
+        self.improvements = np.count_nonzero(changed)
+        for i in np.flatnonzero(changed):
+            population.set_xf(i, X[i], F[i:i+1])
+
+        self.flush_log()
         return population
+
+    def linear_c_update(self, c):
+        """
+        Update sensor modality according to the classic linear rule according to [Arora et al. 2016]
+        """
+        return c + 0.025 / (c * self.max_iterations)
+
+    def nonlinear_c_update(self, c):
+        """
+        Update sensor modality using a non-linear update rule according to [Zhang et al. 2020]
+        """
+        (a0, a1) = (0.1, 0.3)
+        it = (self.current_iteration/self.max_iterations)**2
+        return a0 - (a0-a1)*math.sin(math.pi/self.mu*it)
+
+    def batch_fitness(self, problem, X):
+        """
+        Evaluate the fitness of all the solutions (rows) of X at once. If the cache is enabled, only
+        the solutions that are not in the cache are evaluated (once if they are duplicated)
+        """
+        if self.cache_size <= 0:
+            return self.evaluate(problem, X)
+        keys = [x.tobytes() for x in X]
+        fitness = [self.lookup_fitness(key) for key in keys]
+        missing = dict()
+        for idx, key in enumerate(keys):
+            if fitness[idx] is None and key not in missing:
+                missing[key] = idx
+        self.cache_hits += len(X) - len(missing)
+        self.cache_misses += len(missing)
+        new_fitness = dict()
+        if missing:
+            new_fitness = dict(zip(missing, self.evaluate(problem, X[list(missing.values())])))
+        for key, fit in new_fitness.items():
+            self.save_fitness(key, fit)
+        return np.array([new_fitness[key] if fit is None else fit for key, fit in zip(keys, fitness)])
+
+    def evaluate(self, problem, X):
+        """
+        Evaluate the fitness of all the solutions (rows) of X without using the cache
+        """
+        if self.bfe is not None:
+            return self.bfe(problem, X.ravel())
+        if problem.has_batch_fitness():
+            return problem.batch_fitness(X.ravel())
+        if self.n_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.n_workers) as pool:
+                return np.array([fit[0] for fit in pool.map(problem.fitness, X)])
+        return np.array([problem.fitness(x)[0] for x in X])
+
+    def lookup_fitness(self, key):
+        """
+        Return the fitness of a solution from the cache (None if it is missing) and mark it as recently used
+        """
+        fitness = self.fitness_cache.get(key)
+        if fitness is not None:
+            self.fitness_cache.move_to_end(key)
+        return fitness
+
+    def get_cache_hit_rate(self):
+        """
+        Return the proportion of the solutions of the last generation found in the fitness cache
+        """
+        evaluations = self.cache_hits + self.cache_misses
+        return self.cache_hits / evaluations if evaluations > 0 else 0
+
+    def should_stop(self):
+        """
+        Return True if the population only revisits solutions that are in the fitness cache
+        (more than 95% of cache hits in the last generation, after at least 6 generations)
+        """
+        return self.evolved_generations > 5 and self.get_cache_hit_rate() > 0.95
+
+    def save_fitness(self, key, fitness):
+        """
+        Add a fitness to the cache (least recently used solutions are removed when it is full)
+        """
+        if self.cache_size > 0:
+            if len(self.fitness_cache) >= self.cache_size:
+                self.fitness_cache.popitem(last=False)
+            self.fitness_cache[key] = fitness
     
     def set_verbosity(self, l):
         """
@@ -165,24 +272,35 @@ class XBOA:
         """
         return self.log
 
+    def get_improvements(self):
+        """
+        Return the number of butterflies that have improved during the last call to evolve
+        """
+        return self.improvements
+
     def save_log(self, iteration, fevals, fbest, improvemnt):
         """
-        Archive and print logs
+        Archive logs (they are printed by flush_log)
         """
         if self.verbosity_level > 0 and iteration % self.verbosity_level == 0:
             self.log.append([iteration, fevals, fbest, improvemnt])
-            print("{:^7}{:^7}{:>15}{:>15}".format(iteration, 
+            self.pending_log.append("{:^7}{:^7}{:>15}{:>15}\n".format(iteration, 
                 fevals, round(fbest, 7), round(improvemnt, 7)))
 
-    def force_bounds(self, x, bounds):
+    def flush_log(self):
+        """
+        Print the logs archived since the last flush (called once at the end of evolve)
+        """
+        if self.pending_log:
+            sys.stdout.write("".join(self.pending_log))
+            sys.stdout.flush()
+            self.pending_log.clear()
+
+    def force_bounds(self, x, lb, ub):
         """  
-        Force solution genes to be within lower & upper bounds
+        Force solution genes to be within lower & upper bounds (x is modified in place)
         """
-        for k in range(len(x)):
-            if x[k] < bounds[0][k]:
-                x[k] = bounds[0][k]
-            elif x[k] > bounds[1][k]:
-                x[k] = bounds[1][k]
+        np.clip(x, lb, ub, out=x)
         return x
 
     def set_iter(self, i):